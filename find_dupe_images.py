@@ -1,60 +1,285 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import errno
 import functools
 import hashlib
 import json
 import math
+import mmap
+import os
 import shutil
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Iterable, Iterator
 
 import numpy as np
 from PIL import Image, ImageOps
 from rich.live import Live
 
+try:
+    import blake3  # optional: much faster content digests than SHA-256
+except ImportError:
+    blake3 = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+FICLONE = getattr(fcntl, "FICLONE", None)  # Linux only
+
+from modules.hash_cache import HashCache
 from modules.ui_console import UISplit
 from modules.web_review import ReviewServer, serve_review_ui
 
-IMG_EXTS = {
-    ".jpg",
-    ".jpeg",
-    ".png",
-    ".gif",
-    ".bmp",
-    ".tiff",
-    ".tif",
-    ".webp",
-    ".heic",
-    ".heif",
-}
+IMG_EXTS = frozenset(
+    {
+        ".jpg",
+        ".jpeg",
+        ".png",
+        ".gif",
+        ".bmp",
+        ".tiff",
+        ".tif",
+        ".webp",
+        ".heic",
+        ".heif",
+    }
+)
 MANIFEST_NAME = "_manifest.tsv"
 GROUP_META_NAME = "_group_meta.json"
+PREFIX_BYTES = 64 * 1024
+COMPARE_CHUNK = 1024 * 1024
+OPEN_FILE_BUDGET = 256
+SMALL_FILE_BYTES = 1024 * 1024
+MMAP_MAX_BYTES = 512 * 1024 * 1024
+MIH_MIN_CHUNK_BITS = 4
 
 
-def iter_files(root: Path, include_all: bool = False):
-    for p in root.rglob("*"):
-        if not p.is_file():
+def iter_files(
+    root: Path, include_all: bool = False
+) -> Iterator[tuple[Path, int, int]]:
+    """
+    Yield (path, size, mtime_ns) for every matching regular file under root.
+    os.scandir reports entry types from the directory listing itself, so filtering
+    needs no per-file stat; size and mtime come from the DirEntry's single stat so
+    later stages (size buckets, hash cache lookups) don't stat again.
+    """
+    stack = [str(root)]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
             continue
-        if include_all:
-            yield p
-        else:
-            if p.suffix.lower() in IMG_EXTS:
-                yield p
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                        continue
+                    if not e.is_file(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+                if not include_all:
+                    name = e.name
+                    dot = name.rfind(".")
+                    if dot <= 0 or name[dot:].lower() not in IMG_EXTS:
+                        continue
+                try:
+                    st = e.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield Path(e.path), st.st_size, st.st_mtime_ns
 
 
-def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
-    h = hashlib.sha256()
+def _advise_sequential(fd: int) -> None:
+    """
+    Ask the kernel for aggressive readahead on a file we are about to read
+    start to finish. Helps most on HDDs and network mounts; no-op elsewhere.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+
+def sha256_file(path: Path) -> str:
+    # One update() over a mapping lets OpenSSL (SHA-NI when available) stream the
+    # whole file; file_digest's C read loop covers huge and unmappable files.
+    with path.open("rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= SMALL_FILE_BYTES:
+            return hashlib.sha256(f.read()).hexdigest()  # one read, no mmap setup
+        if size <= MMAP_MAX_BYTES:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    return hashlib.sha256(mm).hexdigest()
+            except (OSError, ValueError):
+                pass
+        _advise_sequential(f.fileno())
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def prefix_digest(path: Path, size: int = PREFIX_BYTES) -> bytes:
+    """
+    Cheap fingerprint of the first and last `size` bytes of a file.
+    Used to split size-collision buckets before paying for a full SHA-256.
+    """
+    h = hashlib.blake2b(digest_size=16)
     with path.open("rb") as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
+        head = f.read(size)
+        h.update(head)
+        if len(head) == size:
+            f.seek(-size, os.SEEK_END)
+            h.update(f.read(size))
+    return h.digest()
+
+
+def _prefix_digest_safe(path: Path) -> bytes | None:
+    try:
+        return prefix_digest(path)
+    except OSError:
+        return None
+
+
+def _content_tag(crypto: bool = False) -> str:
+    return "b3" if blake3 is not None and not crypto else "sha"
+
+
+def _new_content_hasher(crypto: bool = False) -> tuple[str, Any]:
+    tag = _content_tag(crypto)
+    return tag, blake3.blake3() if tag == "b3" else hashlib.sha256()
+
+
+def content_digest(path: Path, crypto: bool = False) -> str:
+    """
+    Content fingerprint for exact matching, tagged with its algorithm:
+    "b3:<hex>" when the blake3 package is installed, else "sha:<hex>".
+    crypto=True always uses SHA-256 (e.g. to compare against external checksums).
+    """
+    if blake3 is not None and not crypto:
+        h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        h.update_mmap(path)
+        return f"b3:{h.hexdigest()}"
+    return f"sha:{sha256_file(path)}"
+
+
+def _content_digest_safe(path: Path, crypto: bool = False) -> str | None:
+    try:
+        return content_digest(path, crypto)
+    except OSError:
+        return None
+
+
+class _OpenFileBudget:
+    """
+    Caps how many files split_identical calls may hold open at once, across threads.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._available = capacity
+        self._cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def hold(self, n: int):
+        with self._cond:
+            self._cond.wait_for(lambda: self._available >= n)
+            self._available -= n
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._available += n
+                self._cond.notify_all()
+
+
+_OPEN_FILES = _OpenFileBudget(OPEN_FILE_BUDGET)
+
+
+def split_identical(
+    files: list[Path], chunk_size: int = COMPARE_CHUNK, crypto: bool = False
+) -> list[tuple[str, list[Path]]]:
+    """
+    Split same-size files into sets of byte-identical files.
+    All files are read in lockstep, chunk by chunk, and a file stops being read as
+    soon as its content diverges from every other file. Returns
+    (content_digest, files) for every set of 2+; digests match content_digest().
+    """
+    if len(files) > _OPEN_FILES.capacity:
+        by_digest: dict[str, list[Path]] = defaultdict(list)
+        for f in files:
+            digest = _content_digest_safe(f, crypto)
+            if digest is not None:
+                by_digest[digest].append(f)
+        return [(k, v) for k, v in by_digest.items() if len(v) > 1]
+
+    # Bound memory: every member holds one chunk per round.
+    chunk_size = max(64 * 1024, min(chunk_size, (32 << 20) // len(files)))
+    tag, hasher = _new_content_hasher(crypto)
+    out: list[tuple[str, list[Path]]] = []
+
+    with _OPEN_FILES.hold(len(files)), contextlib.ExitStack() as stack:
+        members: list[tuple[Path, Any]] = []
+        for f in files:
+            try:
+                members.append((f, stack.enter_context(f.open("rb"))))
+            except OSError:
+                continue
+
+        # Each pending entry: files identical so far + hasher over their shared prefix.
+        pending = [(hasher, members)] if len(members) > 1 else []
+        while pending:
+            hasher, members = pending.pop()
+            chunks: list[tuple[bytes, Path, Any]] = []
+            for f, fh in members:
+                try:
+                    chunks.append((fh.read(chunk_size), f, fh))
+                except OSError:
+                    fh.close()
+
+            first = chunks[0][0] if chunks else b""
+            if all(c == first for c, _, _ in chunks):
+                splits = [(first, [(f, fh) for _, f, fh in chunks])]
+            else:
+                by_chunk: dict[bytes, list[tuple[Path, Any]]] = defaultdict(list)
+                for c, f, fh in chunks:
+                    by_chunk[c].append((f, fh))
+                splits = list(by_chunk.items())
+
+            live = []
+            for c, group in splits:
+                if len(group) > 1:
+                    live.append((c, group))
+                else:
+                    for _, fh in group:
+                        fh.close()
+
+            hashers = [hasher] + [hasher.copy() for _ in live[1:]]
+            for h, (c, group) in zip(hashers, live):
+                if not c:
+                    out.append((f"{tag}:{h.hexdigest()}", [f for f, _ in group]))
+                    continue
+                h.update(c)
+                pending.append((h, group))
+
+    return out
+
+
+def _hash_workers() -> int:
+    # hashlib releases the GIL while hashing, so threads overlap reads and SHA work.
+    return min(32, (os.cpu_count() or 1) * 2)
 
 
 @dataclass(frozen=True)
@@ -71,21 +296,40 @@ class HashedImage:
     value: int
 
 
-def hamming_distance(a: int, b: int) -> int:
-    return int(a ^ b).bit_count()
+def _pack_bits(bits: np.ndarray) -> int:
+    """
+    Pack a flat boolean array into an int, first element as the most significant bit.
+    """
+    packed = np.packbits(bits)
+    return int.from_bytes(packed.tobytes(), "big") >> ((-bits.size) % 8)
 
 
-def average_hash_64(path: Path, hash_size: int = 8) -> int:
+def _load_gray(path: Path, size: tuple[int, int]) -> Image.Image:
+    """
+    Open an image upright, in grayscale, resized to `size` for hashing.
+    draft() lets JPEGs decode straight at 1/2-1/8 scale; keeping >= 8x the target
+    leaves LANCZOS enough detail that hashes match a full-resolution decode.
+    """
     with Image.open(path) as img:
+        img.draft("L", (size[0] * 8, size[1] * 8))
         img = ImageOps.exif_transpose(img).convert("L")
-        img = img.resize((hash_size, hash_size), Image.Resampling.LANCZOS)
-        pixels = list(img.getdata())  # type: ignore
+        return img.resize(size, Image.Resampling.LANCZOS)
 
-    avg = sum(pixels) / len(pixels)
-    bits = 0
-    for px in pixels:
-        bits = (bits << 1) | (1 if px >= avg else 0)
-    return bits
+
+def average_hash_64(path: Path, hash_size: int = 8) -> int:
+    img = _load_gray(path, (hash_size, hash_size))
+    pixels = np.asarray(img, dtype=np.uint8).ravel()
+    return _pack_bits(pixels >= pixels.mean())
+
+
+def dhash_64(path: Path, hash_size: int = 8) -> int:
+    """
+    Difference hash: one bit per horizontal gradient sign on a (hash_size+1) x
+    hash_size thumbnail. Separates distinct images better than aHash.
+    """
+    img = _load_gray(path, (hash_size + 1, hash_size))
+    pixels = np.asarray(img, dtype=np.int16)
+    return _pack_bits((pixels[:, 1:] > pixels[:, :-1]).ravel())
 
 
 @functools.lru_cache(maxsize=None)
@@ -100,53 +344,110 @@ def _dct_basis(n: int) -> np.ndarray:
     return mat
 
 
-def _dct_2d(block: np.ndarray) -> np.ndarray:
+def _dct_2d(block: np.ndarray, keep: int | None = None) -> np.ndarray:
     """
     Lightweight 2D DCT-II using a precomputed basis matrix.
+    With `keep`, only the top-left keep x keep (low-frequency) coefficients are
+    computed, which skips most of the work when a caller discards the rest.
     """
     n, m = block.shape
     if n != m:
         raise ValueError("DCT block must be square")
-    basis = _dct_basis(n)
+    basis = _dct_basis(n)[:keep]
     return basis @ block @ basis.T
 
 
 def phash_64(path: Path, hash_size: int = 8, highfreq_factor: int = 4) -> int:
     dim = hash_size * highfreq_factor
-    with Image.open(path) as img:
-        img = ImageOps.exif_transpose(img).convert("L")
-        img = img.resize((dim, dim), Image.Resampling.LANCZOS)
-        block = np.asarray(img, dtype=float)
+    block = np.asarray(_load_gray(path, (dim, dim)), dtype=float)
+    dct = _dct_2d(block, keep=hash_size + 1)
+    low_freq = dct[1:, 1:]
+    flat = low_freq.ravel()
+    return _pack_bits(flat >= flat.mean())
 
-    dct = _dct_2d(block)
-    low_freq = dct[1 : hash_size + 1, 1 : hash_size + 1]
-    flat = low_freq.flatten()
-    avg = flat.mean()
 
-    bits = 0
-    for val in flat:
-        bits = (bits << 1) | (1 if val >= avg else 0)
-    return bits
+PERCEPTUAL_HASHERS: dict[str, Callable[..., int]] = {
+    "ahash": average_hash_64,
+    "dhash": dhash_64,
+    "phash": phash_64,
+}
+DETECTION_MODES = ["exact", *PERCEPTUAL_HASHERS]
+# Bump whenever hasher output changes, so cached values from older runs are ignored.
+PERCEPTUAL_HASH_REV = 2
 
 
-def find_exact_groups(files: list[Path]) -> list[DupeGroup]:
+def find_exact_groups(
+    files: Iterable[tuple[Path, int, int]],
+    crypto: bool = False,
+    cache: HashCache | None = None,
+) -> list[DupeGroup]:
+    tag = _content_tag(crypto)
     by_size: dict[int, list[Path]] = defaultdict(list)
-    for f in files:
-        try:
-            by_size[f.stat().st_size].append(f)
-        except OSError:
-            continue
-
+    by_prefix: dict[tuple[int, bytes], list[Path]] = defaultdict(list)
     by_hash: dict[str, list[Path]] = defaultdict(list)
-    for bucket in by_size.values():
-        if len(bucket) < 2:
-            continue
-        for f in bucket:
-            try:
-                digest = sha256_file(f)
-                by_hash[digest].append(f)
-            except OSError:
+    stats: dict[Path, tuple[int, int]] = {}
+    computed: list[tuple[Path, str]] = []
+    with ThreadPoolExecutor(max_workers=_hash_workers()) as ex:
+        # Most same-size files already differ in their header/trailer bytes. A file
+        # needs that prefix digest as soon as a second file of its size turns up, so
+        # start reading while `files` is still being scanned.
+        prefixes: list[tuple[int, Path, Future[bytes | None]]] = []
+        for f, size, mtime_ns in files:
+            stats[f] = (size, mtime_ns)
+            bucket = by_size[size]
+            bucket.append(f)
+            if len(bucket) == 2:
+                first = bucket[0]
+                prefixes.append((size, first, ex.submit(_prefix_digest_safe, first)))
+            if len(bucket) >= 2:
+                prefixes.append((size, f, ex.submit(_prefix_digest_safe, f)))
+
+        for sz, f, fut in prefixes:
+            prefix = fut.result()
+            if prefix is not None:
+                by_prefix[(sz, prefix)].append(f)
+
+        lockstep: list[list[Path]] = []
+        full: list[Path] = []
+        for bucket in by_prefix.values():
+            if len(bucket) < 2:
                 continue
+            uncached = bucket
+            if cache is not None:
+                uncached = []
+                for f in bucket:
+                    cached = cache.get(tag, f, *stats[f])
+                    if cached is None:
+                        uncached.append(f)
+                    else:
+                        by_hash[f"{tag}:{cached}"].append(f)
+            if len(uncached) < len(bucket) or len(bucket) > _OPEN_FILES.capacity:
+                # Partly cached, or too big to hold open: digest the rest in full.
+                full.extend(uncached)
+            else:
+                lockstep.append(bucket)
+
+        # Compare the survivors in lockstep so unequal files stop being read early.
+        split = functools.partial(split_identical, crypto=crypto)
+        for identical in ex.map(split, lockstep):
+            for digest, same in identical:
+                by_hash[digest].extend(same)
+                computed.extend((f, digest) for f in same)
+
+        digest_one = functools.partial(_content_digest_safe, crypto=crypto)
+        for f, digest in zip(full, ex.map(digest_one, full)):
+            if digest is not None:
+                by_hash[digest].append(f)
+                computed.append((f, digest))
+
+    if cache is not None:
+        cache.put_many(
+            tag,
+            (
+                (f, *stats[f], digest.partition(":")[2])
+                for f, digest in computed
+            ),
+        )
 
     groups = [
         DupeGroup(digest=k, files=tuple(sorted(v)), mode="exact")
@@ -157,92 +458,220 @@ def find_exact_groups(files: list[Path]) -> list[DupeGroup]:
     return groups
 
 
+def _chunk_spans(nbits: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Split an nbits-wide hash into `parts` disjoint bit ranges as (shift, mask).
+    """
+    spans: list[tuple[int, int]] = []
+    shift = 0
+    for k in range(parts):
+        width = nbits // parts + (1 if k < nbits % parts else 0)
+        spans.append((shift, (1 << width) - 1))
+        shift += width
+    return spans
+
+
+def greedy_hamming_clusters(
+    values: list[int], threshold: int, nbits: int = 64
+) -> list[list[int]]:
+    """
+    Greedy clustering: each not-yet-clustered hash (in list order) seeds a cluster
+    of every remaining hash within `threshold` bits of it.
+    Returns index lists with the seed first; singletons are included.
+
+    Candidates come from a multi-index hash: split into threshold+1 disjoint chunks,
+    any two hashes within `threshold` bits agree exactly on at least one chunk.
+    Very loose thresholds leave chunks too narrow to help, so fall back to a scan.
+    """
+    n = len(values)
+    alive = np.ones(n, dtype=bool)
+    parts = threshold + 1
+
+    # One row of 64-bit words per hash; distances are hardware popcounts of XORs.
+    nwords = (nbits + 63) // 64
+    packed = np.frombuffer(
+        b"".join(v.to_bytes(nwords * 8, "little") for v in values), dtype="<u8"
+    ).reshape(-1, nwords)
+    spans = _chunk_spans(nbits, parts) if nbits // parts >= MIH_MIN_CHUNK_BITS else []
+
+    tables: list[dict[int, set[int]]] = [defaultdict(set) for _ in spans]
+    for idx, v in enumerate(values):
+        for table, (shift, mask) in zip(tables, spans):
+            table[(v >> shift) & mask].add(idx)
+
+    clusters: list[list[int]] = []
+    for i, seed in enumerate(values):
+        if not alive[i]:
+            continue
+
+        if spans:
+            candidates = np.fromiter(
+                set().union(
+                    *(
+                        table.get((seed >> shift) & mask, ())
+                        for table, (shift, mask) in zip(tables, spans)
+                    )
+                ),
+                dtype=np.intp,
+            )
+        else:
+            candidates = np.flatnonzero(alive)
+
+        dists = np.bitwise_count(packed[candidates] ^ packed[i]).sum(axis=1)
+        members = np.sort(candidates[(dists <= threshold) & (candidates != i)])
+        cluster = [i] + members.tolist()
+        for j in cluster:
+            alive[j] = False
+            for table, (shift, mask) in zip(tables, spans):
+                table[(values[j] >> shift) & mask].discard(j)
+        clusters.append(cluster)
+
+    return clusters
+
+
 def _hash_file_safe(
     path: Path,
     fn: Callable[[Path], int],
-    _render: UISplit,
-) -> int | None:
+) -> tuple[int | None, str | None]:
+    """
+    Runs in a worker thread: return (hash, None) or (None, error message)
+    so failures are logged from the main thread, in file order.
+    """
     try:
-        return fn(path)
+        return fn(path), None
     except Exception as exc:
-        _render.log_main(f"?? Skipping (cannot hash): {path} ({exc})")
-        return None
+        return None, str(exc)
 
 
 def _perceptual_groups(
-    files: list[Path],
+    files: Iterable[tuple[Path, int, int]],
     mode: str,
     threshold: int,
     _render: UISplit,
     hash_size: int = 8,
+    cache: HashCache | None = None,
+    copies: dict[Path, list[Path]] | None = None,
 ) -> list[DupeGroup]:
-    assert mode in {"ahash", "phash"}
-    hasher: Callable[[Path], int]
-    if mode == "ahash":
-        hasher = functools.partial(average_hash_64, hash_size=hash_size)
-    else:
-        hasher = functools.partial(phash_64, hash_size=hash_size)
-
-    hashed: list[HashedImage] = []
-    for p in sorted(files):
-        hv = _hash_file_safe(p, hasher, _render=_render)
-        if hv is not None:
-            hashed.append(HashedImage(path=p, value=hv))
+    """
+    copies: representative path -> byte-identical files left out of `files`;
+    each copy takes its representative's hash instead of being decoded again.
+    """
+    assert mode in PERCEPTUAL_HASHERS
+    hasher = functools.partial(PERCEPTUAL_HASHERS[mode], hash_size=hash_size)
+    algo = f"{mode}{hash_size}.r{PERCEPTUAL_HASH_REV}"
+
+    paths: list[Path] = []
+    values: dict[Path, int] = {}
+    stats: dict[Path, tuple[int, int]] = {}
+    todo: list[tuple[Path, Future[tuple[int | None, str | None]]]] = []
+    # Pillow drops the GIL while decoding and resizing, so threads scale across
+    # cores without spawning processes or pickling paths and results. main()
+    # passes a finished list here (the exact-match pass runs first so copies
+    # are decoded once), so decoding no longer overlaps the directory walk.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for p, size, mtime_ns in files:
+            paths.append(p)
+            if cache is not None:
+                stats[p] = (size, mtime_ns)
+                cached = cache.get(algo, p, size, mtime_ns)
+                if cached is not None:
+                    values[p] = int(cached, 16)
+                    continue
+            todo.append((p, ex.submit(_hash_file_safe, p, hasher)))
+        from_cache = len(values)
+
+        for p, fut in todo:
+            hv, err = fut.result()
+            if hv is None:
+                _render.log_main(f"?? Skipping (cannot hash): {p} ({err})")
+            else:
+                values[p] = hv
+
+    n_copies = 0
+    for rep, dups in (copies or {}).items():
+        paths.extend(dups)
+        if rep in values:
+            n_copies += len(dups)
+            for d in dups:
+                values[d] = values[rep]
+    paths.sort()
+
+    if cache is not None:
+        cache.put_many(
+            algo,
+            (
+                (p, *stats[p], f"{values[p]:x}")
+                for p, _ in todo
+                if p in values
+            ),
+        )
 
+    hashed = [HashedImage(path=p, value=values[p]) for p in paths if p in values]
     _render.log_main(
-        f"Hashed {len(hashed)} file(s) with {mode.upper()} (skipped {len(files) - len(hashed)})."
+        f"Hashed {len(hashed)} file(s) with {mode.upper()} "
+        f"({from_cache} from cache, {n_copies} exact copies, "
+        f"skipped {len(paths) - len(hashed)})."
     )
 
     groups: list[DupeGroup] = []
-    remaining = hashed
-    while remaining:
-        seed = remaining[0]
-        rest = remaining[1:]
-        cluster = [seed]
-        survivors: list[HashedImage] = []
-        for candidate in rest:
-            if hamming_distance(seed.value, candidate.value) <= threshold:
-                cluster.append(candidate)
-            else:
-                survivors.append(candidate)
-        remaining = survivors
-
-        if len(cluster) > 1:
-            digest = f"{seed.value:016x}"
-            paths = tuple(sorted([c.path for c in cluster]))
-            groups.append(
-                DupeGroup(
-                    digest=digest,
-                    files=paths,
-                    mode=mode,
-                    meta={"threshold": threshold, "hash_size": hash_size},
-                )
+    nbits = hash_size * hash_size
+    for cluster_idx in greedy_hamming_clusters(
+        [h.value for h in hashed], threshold, nbits
+    ):
+        if len(cluster_idx) < 2:
+            continue
+        seed = hashed[cluster_idx[0]]
+        digest = f"{seed.value:016x}"
+        members = tuple(sorted([hashed[j].path for j in cluster_idx]))
+        groups.append(
+            DupeGroup(
+                digest=digest,
+                files=members,
+                mode=mode,
+                meta={"threshold": threshold, "hash_size": hash_size},
             )
+        )
 
     groups.sort(key=lambda g: (-len(g.files), g.digest))
     return groups
 
 
-def safe_unique_name(dst_dir: Path, filename: str) -> Path:
+def safe_unique_name(
+    dst_dir: Path, filename: str, taken: set[str] | None = None
+) -> Path:
+    """
+    Pick a non-colliding name in dst_dir.
+    If `taken` is given it is treated as the complete set of (casefolded) names
+    already in dst_dir, so no filesystem checks are made; the result is added to it.
+    """
+
+    def free(c: Path) -> bool:
+        if taken is None:
+            return not c.exists()
+        return c.name.casefold() not in taken
+
     candidate = dst_dir / filename
-    if not candidate.exists():
-        return candidate
-    stem = candidate.stem
-    suf = candidate.suffix
-    i = 1
-    while True:
-        c = dst_dir / f"{stem}__{i}{suf}"
-        if not c.exists():
-            return c
-        i += 1
+    if not free(candidate):
+        stem = candidate.stem
+        suf = candidate.suffix
+        i = 1
+        while True:
+            candidate = dst_dir / f"{stem}__{i}{suf}"
+            if free(candidate):
+                break
+            i += 1
+
+    if taken is not None:
+        taken.add(candidate.name.casefold())
+    return candidate
 
 
 def write_manifest(group_dir: Path, moved_to_original: list[tuple[Path, Path]]) -> None:
-    lines = [
-        f"{moved.as_posix()}\t{original.as_posix()}"
+    data = "".join(
+        f"{moved.as_posix()}\t{original.as_posix()}\n"
         for moved, original in moved_to_original
-    ]
-    (group_dir / MANIFEST_NAME).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    )
+    (group_dir / MANIFEST_NAME).write_bytes(data.encode("utf-8"))
 
 
 def write_group_meta(group_dir: Path, group: DupeGroup) -> None:
@@ -267,8 +696,13 @@ def read_group_meta(group_dir: Path) -> dict[str, Any]:
         return {}
 
 
-def read_manifest(group_dir: Path) -> dict[Path, Path]:
-    mapping: dict[Path, Path] = {}
+def read_manifest(group_dir: Path) -> dict[str, str]:
+    """
+    Returns moved filename -> original posix path, as plain strings.
+    Moved files all live directly in group_dir, so the basename is unique.
+    Callers build a Path only for entries they actually use.
+    """
+    mapping: dict[str, str] = {}
     mpath = group_dir / MANIFEST_NAME
     if not mpath.exists():
         return mapping
@@ -276,7 +710,7 @@ def read_manifest(group_dir: Path) -> dict[Path, Path]:
         if not line.strip():
             continue
         moved_s, original_s = line.split("\t", 1)
-        mapping[Path(moved_s)] = Path(original_s)
+        mapping[moved_s.rpartition("/")[2]] = original_s
     return mapping
 
 
@@ -314,9 +748,39 @@ def delete_with_retry(path: Path, retries: int = 12, delay: float = 0.15) -> boo
     return False
 
 
+def _try_reflink(src: Path, dst: Path) -> bool:
+    """
+    Clone src into dst on copy-on-write filesystems (btrfs, XFS): no data is
+    copied. Returns False where that isn't supported so callers do a real copy.
+    Clones into a temp sibling first, so a failed attempt never leaves an empty
+    file at dst.
+    """
+    if FICLONE is None:
+        return False
+    tmp = dst.with_name(f".{dst.name}.reflink.tmp")
+    try:
+        fdst = tmp.open("xb")  # "x": never clobber a file that has this name
+    except OSError:
+        return False
+    try:
+        with fdst, src.open("rb") as fsrc:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+        return True
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return False
+
+
 def copy_with_retry(
     src: Path, dst: Path, retries: int = 40, delay: float = 0.10
 ) -> None:
+    if _try_reflink(src, dst):
+        return
     for _ in range(retries):
         try:
             shutil.copy2(src, dst)
@@ -331,7 +795,13 @@ def restore_selected_and_delete_rest(
 ) -> None:
     mapping = read_manifest(group_dir)
 
-    ignore = {MANIFEST_NAME.lower(), GROUP_META_NAME.lower(), "_review_state.json"}
+    ignore = {
+        MANIFEST_NAME.lower(),
+        GROUP_META_NAME.lower(),
+        "_review_state.json",
+        "_review_state.json.bak",
+        "_review_state.json.tmp",
+    }
     present = [
         p for p in group_dir.iterdir() if p.is_file() and p.name.lower() not in ignore
     ]
@@ -348,18 +818,12 @@ def restore_selected_and_delete_rest(
                     _render.log_main(f"[WARN] Could not delete (locked): {moved_path}")
             continue
 
-        original = mapping.get(moved_path)
-        if original is None:
-            for k, v in mapping.items():
-                if k.name == name:
-                    original = v
-                    break
-
-        if original is None:
+        original_s = mapping.get(name)
+        if original_s is None:
             # safer: leave it there if we can't map
             continue
 
-        original = original.expanduser()
+        original = Path(original_s).expanduser()
         original.parent.mkdir(parents=True, exist_ok=True)
 
         if original.exists():
@@ -379,6 +843,19 @@ def restore_selected_and_delete_rest(
                 )
 
 
+def _fast_move(src: Path, dst: Path) -> None:
+    """
+    Rename in a single syscall; only fall back to shutil's copy+delete when the
+    destination is on another filesystem.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as exc:
+        if exc.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dst))
+
+
 def stage_all_groups_into_decision_folder(
     groups: list[DupeGroup], decision_root: Path, dry_run: bool, _render: UISplit
 ) -> list[Path]:
@@ -390,7 +867,8 @@ def stage_all_groups_into_decision_folder(
 
     for i, grp in enumerate(groups, 1):
         if grp.mode == "exact":
-            suffix = f"sha_{grp.digest[:10]}"
+            algo, _, hex_digest = grp.digest.partition(":")
+            suffix = f"{algo}_{hex_digest[:10]}"
         else:
             threshold = grp.meta.get("threshold")
             th_s = f"t{int(threshold):02d}_" if isinstance(threshold, int) else ""
@@ -409,11 +887,12 @@ def stage_all_groups_into_decision_folder(
             continue
 
         group_dir.mkdir(parents=True, exist_ok=False)
+        taken: set[str] = set()  # fresh folder: we know every name in it
         moved_to_original: list[tuple[Path, Path]] = []
 
         for original in grp.files:
-            dst = safe_unique_name(group_dir, original.name)
-            shutil.move(str(original), str(dst))
+            dst = safe_unique_name(group_dir, original.name, taken)
+            _fast_move(original, dst)
             moved_to_original.append((dst, original))
 
         write_manifest(group_dir, moved_to_original)
@@ -434,7 +913,7 @@ def find_pending_group_dirs(decision_root: Path) -> list[Path]:
 def group_mode_from_dir(group_dir: Path) -> str:
     meta = read_group_meta(group_dir)
     mode = str(meta.get("mode", "exact")).lower()
-    if mode not in {"exact", "ahash", "phash"}:
+    if mode not in DETECTION_MODES:
         return "exact"
     return mode
 
@@ -449,7 +928,7 @@ def main() -> int:
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument(
         "--mode",
-        choices=["exact", "ahash", "phash"],
+        choices=DETECTION_MODES,
         default="exact",
         help="Duplicate detection mode.",
     )
@@ -457,7 +936,17 @@ def main() -> int:
         "--threshold",
         type=int,
         default=5,
-        help="Hamming distance threshold for aHash/pHash grouping (0-64).",
+        help="Hamming distance threshold for aHash/dHash/pHash grouping (0-64).",
+    )
+    ap.add_argument(
+        "--crypto-hash",
+        action="store_true",
+        help="Use SHA-256 for exact mode even when blake3 is installed.",
+    )
+    ap.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or update the per-user hash cache.",
     )
     ap.add_argument("--host", default="127.0.0.1")
     ap.add_argument("--port", type=int, default=5173)
@@ -489,19 +978,43 @@ def main() -> int:
             ui.log_main("Resuming review from decision folder (skipping rescan/hash).")
             group_dirs = pending
         else:
-            files = list(iter_files(root, include_all=args.include_all))
-            ui.log_main(f"Scanned: {len(files)} files under {root}")
+            # The scan is consumed lazily, so hashing starts while it's still running.
+            entries: list[tuple[Path, int, int]] = []
+
+            def scan() -> Iterator[tuple[Path, int, int]]:
+                for entry in iter_files(root, include_all=args.include_all):
+                    entries.append(entry)
+                    yield entry
+
+            ui.log_main(f"Scanning and hashing files under {root}...")
+            cache = None if args.no_cache else HashCache.open_default()
+            try:
+                if args.mode == "exact":
+                    groups = find_exact_groups(
+                        scan(), crypto=args.crypto_hash, cache=cache
+                    )
+                else:
+                    # Byte-identical copies always share a perceptual hash. Finding
+                    # them first only reads same-size files; then one decode each.
+                    exact = find_exact_groups(scan(), cache=cache)
+                    copies = {g.files[0]: list(g.files[1:]) for g in exact}
+                    skip = {p for dups in copies.values() for p in dups}
+                    groups = _perceptual_groups(
+                        files=[e for e in entries if e[0] not in skip],
+                        mode=args.mode,
+                        threshold=threshold,
+                        _render=ui,
+                        cache=cache,
+                        copies=copies,
+                    )
+            finally:
+                if cache is not None:
+                    cache.close()
+            ui.log_main(f"Scanned: {len(entries)} files under {root}")
 
             if args.mode == "exact":
-                groups = find_exact_groups(files)
                 ui.log_main(f"Exact duplicate groups found: {len(groups)}")
             else:
-                groups = _perceptual_groups(
-                    files=files,
-                    mode=args.mode,
-                    threshold=threshold,
-                    _render=ui,
-                )
                 ui.log_main(
                     f"{args.mode.upper()} near-duplicate groups found: {len(groups)} "
                     f"(threshold={threshold})"
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Optional
+
+BATCH_SIZE = 500
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or "~/.cache"
+    return Path(base).expanduser() / "same_image_locator" / "hashes.sqlite"
+
+
+class HashCache:
+    """
+    Sidecar SQLite store of per-file hashes, keyed by (path, algo).
+    A row is only trusted while the file's size and mtime_ns still match,
+    so repeat scans only re-hash new or modified files.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path))
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                path TEXT NOT NULL,
+                algo TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (path, algo)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def open_default(cls) -> Optional["HashCache"]:
+        """
+        Open the per-user cache, or return None if it can't be created
+        (read-only home, locked database, ...). Caching is best-effort.
+        """
+        try:
+            return cls(default_cache_path())
+        except (OSError, sqlite3.Error):
+            return None
+
+    def get(self, algo: str, path: Path, size: int, mtime_ns: int) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT size, mtime, value FROM hashes WHERE path = ? AND algo = ?",
+            (str(path), algo),
+        ).fetchone()
+        if row is None or row[0] != size or row[1] != mtime_ns:
+            return None
+        return row[2]
+
+    def put_many(
+        self, algo: str, rows: Iterable[tuple[Path, int, int, str]]
+    ) -> None:
+        """
+        rows: (path, size, mtime_ns, value). Written in batches of BATCH_SIZE.
+        """
+        batch: list[tuple[str, str, int, int, str]] = []
+        for path, size, mtime_ns, value in rows:
+            batch.append((str(path), algo, size, mtime_ns, value))
+            if len(batch) >= BATCH_SIZE:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: list[tuple[str, str, int, int, str]]) -> None:
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO hashes (path, algo, size, mtime, value) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+        except sqlite3.Error:
+            # A failed cache write only costs a re-hash next time.
+            pass
+
+    def close(self) -> None:
+        self._conn.close()
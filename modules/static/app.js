@@ -1,7 +1,3 @@
-async function getJSON(url) {
-    const r = await fetch(url);
-    return await r.json();
-}
 async function postJSON(url, body) {
     const r = await fetch(url, {
         method: "POST",
@@ -11,6 +7,17 @@ async function postJSON(url, body) {
     return await r.json();
 }
 
+// /api/group answers 304 while nothing changed; revalidate by hand so an
+// unchanged poll skips both the body and the UI update.
+let groupETag = null;
+async function getGroup() {
+    const headers = groupETag ? { "If-None-Match": groupETag } : {};
+    const r = await fetch("/api/group", { cache: "no-store", headers });
+    if (r.status === 304) return null;
+    groupETag = r.headers.get("ETag");
+    return await r.json();
+}
+
 const GRID = document.getElementById("grid");
 const STATUS = document.getElementById("status");
 const FINISHED = document.getElementById("finishedClicks");
@@ -25,16 +32,12 @@ let AUTO_FINISH = false;
 let finishedClicks = 0;
 let PREFERRED_FOLDER = null;
 
-let lastKeyItems = "";
+let lastItemsRev = null; // server-side revision of ITEMS
 let lastKeyKeep = "";
 
 // DOM cache
 const cards = new Map();
 
-function itemsKey(items) {
-    // stable compare for diffing
-    return items.map(it => it.name + "|" + (it.folder_path || "")).sort().join("\\n");
-}
 function keepKey(setKeep) {
     return [...setKeep].sort().join("\\n");
 }
@@ -46,6 +49,13 @@ function updateKeepClasses() {
     }
 }
 
+// Group-tagged URLs: a name (and even a group folder path, across runs) can
+// repeat, so the server only lets the browser cache file/thumbnail responses
+// tagged with the current set_group token.
+function groupFileURL(prefix, name) {
+    return prefix + encodeURIComponent(name) + "?g=" + encodeURIComponent(lastGroupTag || "");
+}
+
 function mkCard(item) {
     const card = document.createElement("div");
     card.className = "card";
@@ -65,7 +75,15 @@ function mkCard(item) {
         try { await navigator.clipboard.writeText(item.name); } catch { }
     };
 
+    const openBtn = document.createElement("a");
+    openBtn.className = "openBtn";
+    openBtn.textContent = "Open";
+    openBtn.href = groupFileURL("/files/", item.name);
+    openBtn.target = "_blank";
+    openBtn.rel = "noopener";
+
     row.appendChild(label);
+    row.appendChild(openBtn);
     row.appendChild(copyBtn);
 
     const sub = document.createElement("div");
@@ -112,8 +130,9 @@ function mkCard(item) {
     sub.appendChild(preferBtn);
 
     const img = document.createElement("img");
-    img.src = "/files/" + encodeURIComponent(item.name);
+    img.src = groupFileURL("/thumbs/", item.name);
     img.loading = "lazy";
+    img.decoding = "async";
     img.onclick = async () => {
         const res = await postJSON("/api/toggle_keep", { name: item.name });
         if (res.ok) {
@@ -159,7 +178,8 @@ function reconcileGrid() {
 }
 
 let autoFinishArmed = false;
-let lastGroupDir = null;
+let lastGroupTag = null;
+let GROUP_DIR = null; // echoed to /api/finished so a stale click is refused
 
 async function maybeAutoFinish() {
     // Only for exact mode, only when toggle enabled
@@ -174,14 +194,30 @@ async function maybeAutoFinish() {
     if (!autoFinishArmed) return; // prevents immediate firing on page load if state already has 1
     if (finishedClicks >= 2) return;
 
-    // fire two "finished" clicks
-    await postJSON("/api/finished", {});
-    await postJSON("/api/finished", {});
+    // fire two "finished" clicks; disarm first so a re-render while these are
+    // in flight (each click is pushed back over /api/events) can't fire more
     autoFinishArmed = false;
+    const body = { group_dir: GROUP_DIR };
+    await postJSON("/api/finished", body);
+    await postJSON("/api/finished", body);
 }
 
 async function refresh() {
-    const data = await getJSON("/api/group");
+    const data = await getGroup();
+    if (data === null) return;
+    await applyGroupData(data);
+}
+
+// Renders run one at a time, in arrival order: pushes, polls and button
+// handlers can all deliver a payload while a previous render is awaiting.
+let renderQueue = Promise.resolve();
+function applyGroupData(data) {
+    const run = renderQueue.then(() => renderGroupData(data));
+    renderQueue = run.catch(() => {});
+    return run;
+}
+
+async function renderGroupData(data) {
     if (!data.active) {
         STATUS.textContent = "No active group yet...";
         FINISHED.textContent = "Finished clicks: 0/2";
@@ -190,8 +226,9 @@ async function refresh() {
         MODE = "exact";
         AUTO_FINISH = false;
         PREFERRED_FOLDER = data.preferred_folder || null;
+        GROUP_DIR = null;
         finishedClicks = 0;
-        lastKeyItems = "";
+        lastItemsRev = null;
         lastKeyKeep = "";
         if (cards.size > 0) {
             for (const [, obj] of cards.entries()) obj.card.remove();
@@ -201,6 +238,7 @@ async function refresh() {
     }
 
     MODE = data.mode || "exact";
+    GROUP_DIR = data.group_dir;
     ITEMS = data.items || [];
     KEEP = new Set(data.keep || []);
     finishedClicks = data.finished_clicks || 0;
@@ -209,12 +247,16 @@ async function refresh() {
     STATUS.textContent = "Active group: " + data.group_dir + "  (mode: " + MODE + ")";
     FINISHED.textContent = "Finished clicks: " + finishedClicks + "/2";
 
-    const groupChanged = (lastGroupDir !== data.group_dir);
+    const groupChanged = (lastGroupTag !== data.group_tag);
     if (groupChanged) {
         // New group: allow auto-finish to trigger after the first meaningful selection change.
         autoFinishArmed = true;
+        // Cards carry the old group's URLs; rebuild them all
+        for (const [, obj] of cards.entries()) obj.card.remove();
+        cards.clear();
+        lastItemsRev = null;
     }
-    lastGroupDir = data.group_dir;
+    lastGroupTag = data.group_tag;
 
 
     // Auto-finish UI
@@ -230,16 +272,15 @@ async function refresh() {
         AUTOHINT.textContent = AUTO_FINISH ? " (Auto-finish will trigger when exactly 1 is selected.)" : "";
     }
 
-    const kItems = itemsKey(ITEMS);
     const kKeep = keepKey(KEEP);
 
-    if (kItems !== lastKeyItems) {
+    if (data.items_rev !== lastItemsRev) {
         reconcileGrid();
     } else if (kKeep !== lastKeyKeep) {
         updateKeepClasses();
     }
 
-    lastKeyItems = kItems;
+    lastItemsRev = data.items_rev;
     lastKeyKeep = kKeep;
 
     await maybeAutoFinish();
@@ -252,8 +293,9 @@ document.getElementById("btnReset").onclick = async () => {
     await refresh();
 };
 document.getElementById("btnFinished").onclick = async () => {
-    await postJSON("/api/finished", {});
-    await refresh();
+    const res = await postJSON("/api/finished", { group_dir: GROUP_DIR });
+    if (res.group) await applyGroupData(res.group);
+    else await refresh();
 };
 BTN_AUTOFIN.onclick = async () => {
     if (MODE !== "exact") return;
@@ -265,6 +307,29 @@ BTN_AUTOFIN.onclick = async () => {
     }
 };
 
-// poll
-setInterval(refresh, 900);
-refresh();
+// Poll while the tab is visible; conditional GETs make unchanged polls cheap.
+let polling = false;
+function startPolling() {
+    if (polling) return;
+    polling = true;
+    setInterval(() => {
+        if (document.visibilityState === "visible") refresh();
+    }, 900);
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "visible") refresh();
+    });
+    refresh();
+}
+
+// The server pushes every change over /api/events. Streams end periodically
+// and EventSource reconnects on its own; if the server turns us away (too
+// many open streams -> 204, readyState CLOSED), fall back to polling.
+if (window.EventSource) {
+    const events = new EventSource("/api/events");
+    events.onmessage = (e) => applyGroupData(JSON.parse(e.data));
+    events.onerror = () => {
+        if (events.readyState === EventSource.CLOSED) startPolling();
+    };
+} else {
+    startPolling();
+}
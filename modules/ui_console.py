@@ -1,4 +1,5 @@
 from collections import deque
+from itertools import islice
 from threading import Lock
 from rich.console import Console
 from rich.layout import Layout
@@ -6,6 +7,25 @@ from rich.panel import Panel
 from rich.text import Text
 
 
+class _LogPanel:
+    """
+    Renders the visible tail of a log buffer only when Rich refreshes the screen,
+    so a burst of log lines costs an append each instead of a re-render each.
+    """
+
+    def __init__(self, ui: "UISplit", buf: deque, title: str):
+        self._ui = ui
+        self._buf = buf
+        self._title = title
+
+    def __rich__(self) -> Panel:
+        max_lines = self._ui._visible_line_count()
+        with self._ui._lock:
+            tail = list(islice(reversed(self._buf), max_lines))
+        tail.reverse()
+        return Panel(Text("\n".join(tail)), title=self._title)
+
+
 class UISplit:
     def __init__(self):
         self.console = Console(emoji=True)
@@ -22,25 +42,14 @@ class UISplit:
         self._flask_lines = deque(maxlen=5000)
         self._main_lines = deque(maxlen=5000)
 
-        self._render()
+        self.layout["flask"].update(_LogPanel(self, self._flask_lines, "Flask"))
+        self.layout["main"].update(_LogPanel(self, self._main_lines, "Main Script"))
 
     def _visible_line_count(self) -> int:
         # Panel borders + title eat a couple lines. Give it a little padding.
         h = self.console.height
         return max(5, h - 4)
 
-    def _render(self):
-        max_lines = self._visible_line_count()
-
-        flask_tail = list(self._flask_lines)[-max_lines:]
-        main_tail = list(self._main_lines)[-max_lines:]
-
-        flask_text = Text("\n".join(flask_tail))
-        main_text = Text("\n".join(main_tail))
-
-        self.layout["flask"].update(Panel(flask_text, title="Flask"))
-        self.layout["main"].update(Panel(main_text, title="Main Script"))
-
     def _append_lines(self, buf: deque, msg: str):
         # Split multi-line messages so the deque is truly line-based
         lines = msg.splitlines() or [msg]
@@ -50,9 +59,7 @@ class UISplit:
     def log_flask(self, msg: str):
         with self._lock:
             self._append_lines(self._flask_lines, msg)
-            self._render()
 
     def log_main(self, msg: str):
         with self._lock:
             self._append_lines(self._main_lines, msg)
-            self._render()
@@ -1,20 +1,162 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import io
 import json
+import os
+import queue
+import socket
 import threading
 import time
 import mimetypes
 import logging
+import zlib
 import flask.cli
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
-from flask import Flask, jsonify, request, Response, render_template
+from flask import Flask, jsonify, request, Response, render_template, send_file
+from flask.json.provider import DefaultJSONProvider
+from PIL import Image, ImageOps
+
+try:
+    import orjson  # optional: faster JSON for the polled /api endpoints
+except ImportError:
+    orjson = None
+
+try:
+    import waitress  # optional: multi-threaded production WSGI server
+except ImportError:
+    waitress = None
 
 STATE_FILENAME = "_review_state.json"
+STATE_BACKUP_NAME = STATE_FILENAME + ".bak"
 MANIFEST_NAME = "_manifest.tsv"
 GROUP_META_NAME = "_group_meta.json"
+THUMBS_DIRNAME = "_thumbs"
+THUMB_SIZE = (480, 480)
+# Bookkeeping files that live in a group folder but aren't review items
+NON_ITEM_NAMES = frozenset(
+    n.lower()
+    for n in (
+        MANIFEST_NAME,
+        STATE_FILENAME,
+        STATE_BACKUP_NAME,
+        STATE_FILENAME + ".tmp",
+        GROUP_META_NAME,
+        "_preview.html",
+    )
+)
+GROUP_FILE_MAX_AGE = 3600  # seconds; for URLs tagged with the active group
+SERVER_START_TIMEOUT = 1.0  # seconds to wait for the port to accept connections
+EVENTS_CHECK_INTERVAL = 2.0  # seconds between folder checks on /api/events
+EVENTS_KEEPALIVE = 5.0  # seconds of silence before an SSE keepalive comment
+EVENTS_STREAM_LIFETIME = 60.0  # seconds; then the stream ends and the client reconnects
+EVENTS_MAX_STREAMS = 4  # concurrent /api/events streams; extra clients poll instead
+SERVER_THREADS = 16  # waitress workers; EVENTS_MAX_STREAMS of them may be streaming
+STATE_FLUSH_DELAY = 0.1  # seconds; coalesces rapid toggles into one state write
+
+
+def make_thumbnail(src: Path, dst: Path) -> None:
+    """
+    Render a small JPEG preview of src at dst (written atomically).
+    """
+    with Image.open(src) as img:
+        img.draft("RGB", THUMB_SIZE)  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(THUMB_SIZE)
+        img = img.convert("RGB")
+
+    dst.parent.mkdir(exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{threading.get_ident()}.tmp")
+    img.save(tmp, "JPEG", quality=82)
+    os.replace(tmp, dst)
+
+
+def write_bytes_atomic(path: Path, data: bytes, backup: Optional[Path] = None) -> None:
+    """
+    Replace path with data so readers see either the old or the new contents,
+    never a truncated file. With `backup`, the previous version is moved there.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    if backup is not None:
+        try:
+            os.replace(path, backup)
+        except FileNotFoundError:
+            pass
+    os.replace(tmp, path)
+
+
+def _json_default(obj):
+    # Sets in the review state (keep) are written as sorted lists
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+@functools.lru_cache(maxsize=64)
+def mimetype_for_suffix(suffix: str) -> str:
+    """
+    MIME type for a lowercased file suffix; cached, as a group only has a few.
+    """
+    return mimetypes.guess_type("file" + suffix)[0] or "application/octet-stream"
+
+
+def send_group_file(path: Path, mimetype: str, immutable: bool = False) -> Response:
+    """
+    Serve a file with ETag / Range support so the browser can revalidate instead
+    of re-downloading. On Windows the bytes are read up front: an open handle
+    would block moving or deleting the file once the group is finished.
+    immutable: the URL names this exact file (group-tagged), so the browser may
+    reuse it without revalidating.
+    """
+    max_age = GROUP_FILE_MAX_AGE if immutable else 0
+    if os.name != "nt":
+        resp = send_file(path, mimetype=mimetype, conditional=True, max_age=max_age)
+    else:
+        st = path.stat()
+        data = io.BytesIO(path.read_bytes())  # file handle closes immediately
+        etag = f"{st.st_mtime}-{st.st_size}-{zlib.adler32(str(path).encode())}"
+        resp = send_file(
+            data,
+            mimetype=mimetype,
+            conditional=True,
+            etag=etag,
+            last_modified=st.st_mtime,
+            max_age=max_age,
+        )
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    jsonify() / request.get_json() backed by orjson. Keys stay sorted so the
+    responses match Flask's default provider.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        # Hand orjson's bytes straight to the response; skips a decode/encode.
+        # Same argument handling as jsonify(): one value, several, or kwargs.
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE
+        body = orjson.dumps(obj, option=option)
+        return self._app.response_class(body, mimetype=self.mimetype)
 
 
 @dataclass
@@ -29,15 +171,53 @@ class ReviewServer:
         self.port = port
 
         self._app = Flask(__name__, template_folder="templates", static_folder="static")
+        if orjson is not None:
+            self._app.json = OrjsonProvider(self._app)
         self._thread: Optional[threading.Thread] = None
 
         self._lock = threading.Lock()
         self._group_dir: Optional[Path] = None
-        self._mode: str = "exact"  # "exact", "ahash", or "phash"
-        self._result_ready = threading.Event()
-        self._result: Optional[ReviewResult] = None
+        self._mode: str = "exact"  # "exact", "ahash", "dhash", or "phash"
+        # One producer (api_finished) and one consumer (wait_result)
+        self._results: queue.SimpleQueue[ReviewResult] = queue.SimpleQueue()
+        # (group_dir, dir mtime, manifest mtime) -> items; the UI polls constantly
+        self._items_cache: Optional[tuple[tuple, list[dict], frozenset[str]]] = None
+        # (manifest path, mtime_ns) -> parsed manifest; state flushes bump the
+        # folder mtime and force a relisting, but rarely touch the manifest
+        self._manifest_cache: Optional[tuple[tuple, dict[str, str]]] = None
+        # Unique per set_group() call (folder paths repeat across runs); the UI
+        # tags file URLs with it and only tagged responses may be cached.
+        self._group_seq = 0
+        self._group_tag: Optional[str] = None
+        # (group_dir, item names, group tag) published on every listing; /files
+        # and /thumbs read it without the lock. Replaced whole, never mutated.
+        self._published: tuple[Optional[Path], frozenset[str], Optional[str]] = (
+            None,
+            frozenset(),
+            None,
+        )
+        # In-memory review state for the active group; written back to disk
+        # STATE_FLUSH_DELAY after a change, and immediately on group switch/finish.
+        self._state: Optional[dict] = None
+        self._state_dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        # Serializes state file writes; always taken after _lock, never before
+        self._write_lock = threading.Lock()
+        # (path, bytes) of the last state write; guarded by _write_lock
+        self._last_state_write: Optional[tuple[Path, bytes]] = None
+        # Bumped on every state change; with the items cache key it forms the
+        # /api/group ETag, so unchanged polls get a bodiless 304.
+        self._state_rev = 0
+        # Notified on every state change / group switch; wakes /api/events streams
+        self._changed = threading.Condition(self._lock)
+        self._event_streams = 0  # open /api/events streams; guarded by _lock
+        # Bumped whenever the item list actually changes; lets the UI skip diffing
+        self._items_rev = 0
+        self._etag_prefix = f"{os.getpid()}.{time.time_ns()}"
 
         self._browser_opened = False
+        # (body, etag), rendered once; the page is static
+        self._index_page: Optional[tuple[bytes, str]] = None
         self._register_routes()
 
         # Global preferences across groups (most recent first)
@@ -56,6 +236,11 @@ class ReviewServer:
         logging.getLogger("werkzeug").setLevel(logging.INFO)
 
         def run():
+            if waitress is not None:
+                waitress.serve(
+                    self._app, host=self.host, port=self.port, threads=SERVER_THREADS
+                )
+                return
             self._app.run(
                 host=self.host,
                 port=self.port,
@@ -66,12 +251,27 @@ class ReviewServer:
 
         self._thread = threading.Thread(target=run, daemon=True)
         self._thread.start()
-        time.sleep(0.35)
+        self._wait_until_listening()
 
-    def _apply_global_folder_preference_locked(self) -> None:
+    def _wait_until_listening(self) -> None:
+        """
+        Block until the server accepts connections (so the browser opened next
+        doesn't race it), giving up after SERVER_START_TIMEOUT.
+        """
+        host = "127.0.0.1" if self.host in {"", "0.0.0.0"} else self.host
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline and self._thread.is_alive():
+            try:
+                socket.create_connection((host, self.port), timeout=0.05).close()
+                return
+            except OSError:
+                time.sleep(0.01)
+
+    def _apply_global_folder_preference_locked(self, state: dict) -> None:
         """
         If any globally-preferred folder appears in this group, auto-select those files.
         Most-recent preferred folder wins (but we select *all* files in that folder within the group).
+        Updates `state` in place; the caller saves it.
         """
         assert self._group_dir is not None
         items = self._list_items_locked()
@@ -79,58 +279,65 @@ class ReviewServer:
         if not items or not self._preferred_folder_order:
             return
 
-        # pick the most recently preferred folder that exists in this group
-        folder_in_group = None
-        folders_here = {it.get("folder_path") for it in items}
-        for fp in self._preferred_folder_order:
-            if fp in folders_here:
-                folder_in_group = fp
-                break
-
+        # one pass: folder_path -> names, then the most recently preferred hit
+        by_folder: dict[str, set[str]] = {}
+        for it in items:
+            by_folder.setdefault(it.get("folder_path"), set()).add(it["name"])
+        folder_in_group = next(
+            (fp for fp in self._preferred_folder_order if fp in by_folder), None
+        )
         if not folder_in_group:
             return
 
-        keep = [it["name"] for it in items if it.get("folder_path") == folder_in_group]
-
-        state = self._load_state_locked() or {}
-        state["keep"] = sorted(set(keep))
+        state["keep"] = by_folder[folder_in_group]
         state["preferred_folder"] = folder_in_group
         # do NOT change finished_clicks here; no auto-finish.
-        self._save_state_locked(state)
 
     def set_group(self, group_dir: Path, mode: str = "exact") -> None:
         group_dir = group_dir.resolve()
+        # Disk read before taking the lock; nothing else knows this folder yet
+        stored_state = self._read_state_file(group_dir / STATE_FILENAME)
         with self._lock:
+            self._flush_state_locked()
             self._group_dir = group_dir
+            self._group_seq += 1
+            self._group_tag = f"{self._etag_prefix}.g{self._group_seq}"
+            self._published = (group_dir, frozenset(), self._group_tag)
+            self._items_cache = None
+            self._items_rev += 1
+            self._state = stored_state
+            self._state_rev += 1
+            self._changed.notify_all()
             safe_mode = (mode or "exact").lower()
-            if safe_mode not in {"exact", "ahash", "phash"}:
+            if safe_mode not in {"exact", "ahash", "dhash", "phash"}:
                 safe_mode = "exact"
             self._mode = safe_mode
-            self._result = None
-            self._result_ready.clear()
-
-            # init state if missing
-            if self._load_state_locked() is None:
-                self._save_state_locked(
-                    {
-                        "keep": [],
-                        "finished_clicks": 0,
-                        "auto_finish": False,
-                        "preferred_folder": None,
-                    }
-                )
-            # apply remembered preferences across groups
-            self._apply_global_folder_preference_locked()
-            state = self._load_state_locked() or {}
+            self._drain_results_locked()
+
+            # saved state (or defaults) + remembered preferences, saved once
+            state = self._load_state_locked() or {
+                "keep": set(),
+                "finished_clicks": 0,
+                "auto_finish": False,
+                "preferred_folder": None,
+            }
+            self._apply_global_folder_preference_locked(state)
             state["auto_finish"] = (
                 bool(self._auto_finish_global) if self._mode == "exact" else False
             )
             self._save_state_locked(state)
 
     def wait_result(self) -> ReviewResult:
-        self._result_ready.wait()
-        assert self._result is not None
-        return self._result
+        return self._results.get()
+
+    def _drain_results_locked(self) -> None:
+        # Extra Finished clicks after confirming queue duplicates; drop them
+        # so they can't be taken as the next group's answer.
+        while True:
+            try:
+                self._results.get_nowait()
+            except queue.Empty:
+                return
 
     # ---------------------------
     # Helpers
@@ -142,17 +349,87 @@ class ReviewServer:
     def _load_state_locked(self) -> Optional[dict]:
         if self._group_dir is None:
             return None
-        p = self._state_path_locked()
-        if not p.exists():
-            return None
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return None
+        if self._state is None:
+            self._state = self._read_state_file(self._state_path_locked())
+        return dict(self._state) if self._state is not None else None
+
+    @staticmethod
+    def _read_state_file(p: Path) -> Optional[dict]:
+        # Fall back to the previous version if the last write didn't complete
+        for path in (p, p.with_name(STATE_BACKUP_NAME)):
+            try:
+                data = path.read_bytes()
+                state = orjson.loads(data) if orjson is not None else json.loads(data)
+                state["keep"] = set(state.get("keep", ()))
+                return state
+            except Exception:
+                continue
+        return None
 
     def _save_state_locked(self, state: dict) -> None:
-        p = self._state_path_locked()
-        p.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        if state == self._state:
+            return  # no-op change: no write, no ETag bump, no SSE push
+        self._state = dict(state)
+        self._state_dirty = True
+        self._state_rev += 1
+        self._changed.notify_all()
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(STATE_FLUSH_DELAY, self._flush_state)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_state(self) -> None:
+        """
+        Timer callback: snapshot the state under _lock, then encode and write it
+        holding only _write_lock, so requests don't wait on the disk. Taking
+        _write_lock before releasing _lock keeps writes in snapshot order.
+        """
+        with self._lock:
+            self._flush_timer = None
+            pending = self._take_dirty_state_locked()
+            if pending is None:
+                return
+            self._write_lock.acquire()
+        try:
+            self._write_state(*pending)
+        except OSError:
+            pass  # group folder already restored and removed
+        finally:
+            self._write_lock.release()
+
+    def _flush_state_locked(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending = self._take_dirty_state_locked()
+        if pending is None:
+            return
+        with self._write_lock:
+            try:
+                self._write_state(*pending)
+            except OSError:
+                pass  # group folder already restored and removed
+
+    def _take_dirty_state_locked(self) -> Optional[tuple[Path, dict]]:
+        # self._state (and its keep set) is replaced, never mutated, so the
+        # writer can encode it after _lock is released
+        if not self._state_dirty or self._state is None or self._group_dir is None:
+            return None
+        self._state_dirty = False
+        return self._state_path_locked(), self._state
+
+    def _write_state(self, path: Path, state: dict) -> None:
+        # Caller holds _write_lock
+        if orjson is not None:
+            data = orjson.dumps(
+                state, default=_json_default, option=orjson.OPT_INDENT_2
+            )
+        else:
+            data = json.dumps(state, indent=2, default=_json_default).encode("utf-8")
+        if self._last_state_write == (path, data):
+            return  # e.g. a toggle undone within STATE_FLUSH_DELAY
+        write_bytes_atomic(path, data, backup=path.with_name(STATE_BACKUP_NAME))
+        self._last_state_write = (path, data)
 
     def _read_manifest_locked(self) -> dict[str, str]:
         """
@@ -161,14 +438,18 @@ class ReviewServer:
         assert self._group_dir is not None
         mpath = self._group_dir / MANIFEST_NAME
         mapping: dict[str, str] = {}
-        if not mpath.exists():
+        try:
+            key = (mpath, mpath.stat().st_mtime_ns)
+        except OSError:
             return mapping
+        if self._manifest_cache is not None and self._manifest_cache[0] == key:
+            return self._manifest_cache[1]
         for line in mpath.read_text(encoding="utf-8").splitlines():
             if not line.strip():
                 continue
             moved_s, original_s = line.split("\t", 1)
-            moved_name = Path(moved_s).name
-            mapping[moved_name] = original_s
+            mapping[moved_s.rpartition("/")[2]] = original_s
+        self._manifest_cache = (key, mapping)
         return mapping
 
     def _list_items_locked(self) -> list[dict]:
@@ -178,21 +459,23 @@ class ReviewServer:
         folder_* based on original path in manifest.
         """
         assert self._group_dir is not None
+        key = self._items_cache_key_locked()
+        if key is not None and self._items_cache and self._items_cache[0] == key:
+            return self._items_cache[1]
+
         manifest = self._read_manifest_locked()
 
-        items: list[dict] = []
-        for p in sorted(self._group_dir.iterdir()):
-            if not p.is_file():
-                continue
-            if p.name.lower() in {
-                MANIFEST_NAME.lower(),
-                STATE_FILENAME.lower(),
-                GROUP_META_NAME.lower(),
-                "_preview.html",
-            }:
-                continue
+        # scandir: is_file() reuses the d_type from readdir, no stat per entry
+        with os.scandir(self._group_dir) as it:
+            names = sorted(
+                e.name
+                for e in it
+                if e.is_file() and e.name.lower() not in NON_ITEM_NAMES
+            )
 
-            original = manifest.get(p.name)
+        items: list[dict] = []
+        for name in names:
+            original = manifest.get(name)
             if original:
                 op = Path(original)
                 folder_path = str(op.parent)
@@ -203,13 +486,93 @@ class ReviewServer:
 
             items.append(
                 {
-                    "name": p.name,
+                    "name": name,
                     "folder_name": folder_name,
                     "folder_path": folder_path,
                 }
             )
+        if self._items_cache is None or self._items_cache[1] != items:
+            self._items_rev += 1
+        name_set = frozenset(names)
+        self._published = (self._group_dir, name_set, self._group_tag)
+        if key is not None:
+            self._items_cache = (key, items, name_set)
         return items
 
+    def _item_names_locked(self) -> frozenset[str]:
+        items = self._list_items_locked()
+        if self._items_cache and self._items_cache[1] is items:
+            return self._items_cache[2]
+        return frozenset(it["name"] for it in items)  # listing wasn't cacheable
+
+    def _items_cache_key_locked(self) -> Optional[tuple]:
+        """
+        Adding, removing or renaming a file bumps the folder's mtime, and the
+        manifest is rewritten rather than edited, so these two cover every change.
+        """
+        assert self._group_dir is not None
+        try:
+            dir_mtime = self._group_dir.stat().st_mtime_ns
+        except OSError:
+            return None
+        try:
+            manifest_mtime = (self._group_dir / MANIFEST_NAME).stat().st_mtime_ns
+        except OSError:
+            manifest_mtime = -1
+        return (self._group_dir, dir_mtime, manifest_mtime)
+
+    def _group_file(self, filename: str) -> Optional[tuple[Path, Optional[str]]]:
+        """
+        (path, group tag) of a review item in the active group, or None. Checks
+        the published snapshot without locking; only a miss (e.g. a file added
+        since the last listing) takes the lock to list again.
+        """
+        group_dir, names, tag = self._published
+        if group_dir is not None and filename in names:
+            return group_dir / filename, tag
+        with self._lock:
+            if self._group_dir is None or filename not in self._item_names_locked():
+                return None
+            return self._group_dir / filename, self._group_tag
+
+    def _group_etag_locked(self) -> Optional[str]:
+        """
+        Changes whenever the /api/group payload may have; None if unknown.
+        """
+        if self._group_dir is None:
+            return f"{self._etag_prefix}.idle"
+        key = self._items_cache_key_locked()
+        if key is None:
+            return None
+        return f"{self._etag_prefix}.{self._state_rev}.{key[1]}.{key[2]}"
+
+    def _group_payload_locked(self) -> dict:
+        """
+        Everything the UI renders for the active group (GET /api/group body).
+        """
+        if self._group_dir is None:
+            return {"active": False}
+        try:
+            items = self._list_items_locked()
+        except FileNotFoundError:
+            return {"active": False}  # finished and removed, next group not set yet
+        state = self._load_state_locked() or {}
+        auto_finish = bool(state.get("auto_finish", False))
+        if self._mode != "exact":
+            auto_finish = False
+        return {
+            "active": True,
+            "group_dir": str(self._group_dir),
+            "group_tag": self._group_tag,
+            "mode": self._mode,
+            "items": items,
+            "items_rev": f"{self._etag_prefix}.{self._items_rev}",
+            "keep": sorted(state.get("keep", ())),
+            "finished_clicks": state.get("finished_clicks", 0),
+            "auto_finish": auto_finish,
+            "preferred_folder": state.get("preferred_folder", None),
+        }
+
     # ---------------------------
     # Routes
     # ---------------------------
@@ -218,7 +581,15 @@ class ReviewServer:
 
         @app.get("/")
         def index():
-            return render_template("index.html")
+            if self._index_page is None:
+                body = render_template("index.html").encode("utf-8")
+                etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+                self._index_page = (body, etag)
+            body, etag = self._index_page
+            resp = Response(body, mimetype="text/html")
+            resp.set_etag(etag)
+            resp.cache_control.no_cache = True
+            return resp.make_conditional(request)
 
         @app.get("/api/group")
         def api_group():
@@ -226,46 +597,123 @@ class ReviewServer:
                 if self._group_dir is None:
                     return jsonify({"active": False})
 
-                items = self._list_items_locked()
-                state = self._load_state_locked() or {}
-                auto_finish = bool(state.get("auto_finish", False))
-                if self._mode != "exact":
-                    auto_finish = False
-                return jsonify(
-                    {
-                        "active": True,
-                        "group_dir": str(self._group_dir),
-                        "mode": self._mode,
-                        "items": items,
-                        "keep": state.get("keep", []),
-                        "finished_clicks": state.get("finished_clicks", 0),
-                        "auto_finish": auto_finish,
-                        "preferred_folder": state.get("preferred_folder", None),
-                    }
-                )
+                etag = self._group_etag_locked()
+                if etag is not None and request.if_none_match.contains(etag):
+                    resp = Response(status=304)
+                    resp.set_etag(etag)
+                    return resp
+
+                resp = jsonify(self._group_payload_locked())
+                if etag is not None:
+                    resp.set_etag(etag)
+                return resp
+
+        @app.get("/api/events")
+        def api_events():
+            """
+            Server-sent events: pushes the /api/group payload whenever it changes,
+            so the UI doesn't have to poll. State changes wake the stream at once;
+            files appearing in the folder are noticed within EVENTS_CHECK_INTERVAL.
+            Each stream holds a server thread, so at most EVENTS_MAX_STREAMS run at
+            once (a 204 tells EventSource to stop; the UI then polls), and each
+            ends after EVENTS_STREAM_LIFETIME so abandoned ones can't pile up.
+            """
+            with self._lock:
+                if self._event_streams >= EVENTS_MAX_STREAMS:
+                    return Response(status=204)
+                # taken here, with the check, so simultaneous connects can't all
+                # slip under the cap before any stream starts running
+                self._event_streams += 1
+
+            def release_stream() -> None:
+                with self._lock:
+                    self._event_streams -= 1
+
+            def stream():
+                yield b"retry: 1000\n\n"
+                last_etag: Optional[str] = None
+                started = last_sent = time.monotonic()
+                first = True
+                while time.monotonic() - started < EVENTS_STREAM_LIFETIME:
+                    payload = None
+                    with self._lock:
+                        if not first:
+                            # checked before sleeping: a notify_all() sent
+                            # while we were yielding would otherwise be lost
+                            self._changed.wait_for(
+                                lambda: self._group_etag_locked() != last_etag,
+                                timeout=EVENTS_CHECK_INTERVAL,
+                            )
+                        etag = self._group_etag_locked()
+                        if first or etag != last_etag:
+                            last_etag = etag
+                            # None: the group folder is gone (main() removes it
+                            # once restored); don't list it until set_group
+                            if etag is None:
+                                payload = {"active": False}
+                            else:
+                                payload = self._group_payload_locked()
+                        first = False
+                    now = time.monotonic()
+                    if payload is not None:
+                        data = self._app.json.dumps(payload)
+                        yield f"data: {data}\n\n".encode("utf-8")
+                        last_sent = now
+                    elif now - last_sent >= EVENTS_KEEPALIVE:
+                        yield b": keepalive\n\n"  # also detects closed clients
+                        last_sent = now
+
+            # the WSGI server closes the response even if it never iterated the
+            # body (client gone first), so the slot is always given back
+            resp = Response(
+                stream(),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+            resp.call_on_close(release_stream)
+            return resp
 
         @app.get("/files/<path:filename>")
         def files(filename: str):
-            with self._lock:
-                if self._group_dir is None:
-                    return ("No active group", 404)
-                path = (self._group_dir / filename).resolve()
+            # safety: only the group's own items, never paths built from the URL
+            found = self._group_file(filename)
+            if found is None:
+                return ("Not found", 404)
+            path, tag = found
+            immutable = tag is not None and request.args.get("g") == tag
 
-                # safety: ensure path is inside group dir
-                if self._group_dir not in path.parents and path != self._group_dir:
-                    return ("Invalid path", 400)
+            mime = mimetype_for_suffix(path.suffix.lower())
+            try:
+                return send_group_file(path, mime, immutable=immutable)
+            except FileNotFoundError:
+                return ("Not found", 404)
 
+        @app.get("/thumbs/<path:filename>")
+        def thumbs(filename: str):
+            """
+            Grid previews: full-size images are slow to decode and paint (and
+            HEIC often can't be shown at all), so serve cached JPEG thumbnails.
+            Falls back to the original file if Pillow can't render it.
+            """
+            found = self._group_file(filename)
+            if found is None:
+                return ("Not found", 404)
+
+            src, tag = found
+            group_dir = src.parent
+            thumb = group_dir / THUMBS_DIRNAME / (src.name + ".jpg")
             try:
-                data = path.read_bytes()  # file handle closes immediately
+                src_mtime = src.stat().st_mtime_ns
             except FileNotFoundError:
                 return ("Not found", 404)
 
-            mime, _ = mimetypes.guess_type(str(path))
-            return Response(
-                data,
-                mimetype=mime or "application/octet-stream",
-                headers={"Cache-Control": "no-store"},
-            )
+            try:
+                if not thumb.exists() or thumb.stat().st_mtime_ns < src_mtime:
+                    make_thumbnail(src, thumb)
+                immutable = tag is not None and request.args.get("g") == tag
+                return send_group_file(thumb, "image/jpeg", immutable=immutable)
+            except Exception:
+                return files(filename)
 
         @app.post("/api/toggle_keep")
         def api_toggle_keep():
@@ -276,25 +724,17 @@ class ReviewServer:
                 if self._group_dir is None:
                     return jsonify({"ok": False, "error": "No active group"}), 400
 
-                present = {it["name"] for it in self._list_items_locked()}
-                if name not in present:
+                if name not in self._item_names_locked():
                     return jsonify({"ok": False, "error": "File not in group"}), 404
 
                 state = self._load_state_locked() or {
-                    "keep": [],
+                    "keep": set(),
                     "finished_clicks": 0,
                     "auto_finish": False,
                 }
-                keep = set(state.get("keep", []))
-
-                if name in keep:
-                    keep.remove(name)
-                else:
-                    keep.add(name)
-
-                state["keep"] = sorted(keep)
+                state["keep"] = state.get("keep", set()) ^ {name}
                 self._save_state_locked(state)
-                return jsonify({"ok": True, "keep": state["keep"]})
+                return jsonify({"ok": True, "keep": sorted(state["keep"])})
 
         @app.post("/api/prefer_folder")
         def api_prefer_folder():
@@ -305,33 +745,33 @@ class ReviewServer:
             data = request.get_json(force=True, silent=True) or {}
             folder_path = str(data.get("folder_path", ""))
 
-            state = self._load_state_locked() or {}
-            current = state.get("preferred_folder")
+            with self._lock:
+                state = self._load_state_locked() or {}
+                current = state.get("preferred_folder")
 
-            # toggle off if clicked again
-            if current == folder_path:
-                state["preferred_folder"] = None
-                # do not change keep; just untoggle preference
-                self._save_state_locked(state)
-                return jsonify(
-                    {
-                        "ok": True,
-                        "preferred_folder": None,
-                        "keep": state.get("keep", []),
-                    }
-                )
+                # toggle off if clicked again
+                if current == folder_path:
+                    state["preferred_folder"] = None
+                    # do not change keep; just untoggle preference
+                    self._save_state_locked(state)
+                    return jsonify(
+                        {
+                            "ok": True,
+                            "preferred_folder": None,
+                            "keep": sorted(state.get("keep", ())),
+                        }
+                    )
 
-            with self._lock:
                 if self._group_dir is None:
                     return jsonify({"ok": False, "error": "No active group"}), 400
 
                 items = self._list_items_locked()
-                keep = [
+                keep = {
                     it["name"] for it in items if it.get("folder_path") == folder_path
-                ]
+                }
 
                 state = self._load_state_locked() or {}
-                state["keep"] = sorted(set(keep))
+                state["keep"] = keep
                 state["preferred_folder"] = folder_path
                 # record global preference (most recent first)
                 if folder_path:
@@ -341,7 +781,11 @@ class ReviewServer:
 
                 self._save_state_locked(state)
                 return jsonify(
-                    {"ok": True, "keep": state["keep"], "preferred_folder": folder_path}
+                    {
+                        "ok": True,
+                        "keep": sorted(keep),
+                        "preferred_folder": folder_path,
+                    }
                 )
 
         @app.post("/api/toggle_auto_finish")
@@ -375,25 +819,46 @@ class ReviewServer:
 
         @app.post("/api/finished")
         def api_finished():
+            data = request.get_json(force=True, silent=True) or {}
+            group_dir = data.get("group_dir")
+
             with self._lock:
                 if self._group_dir is None:
                     return jsonify({"ok": False, "error": "No active group"}), 400
 
-                state = self._load_state_locked() or {"keep": [], "finished_clicks": 0}
+                # a click aimed at an earlier group must not confirm this one
+                if group_dir is not None and str(group_dir) != str(self._group_dir):
+                    return jsonify({"ok": False, "error": "Stale group"}), 409
+
+                state = self._load_state_locked() or {
+                    "keep": set(),
+                    "finished_clicks": 0,
+                }
                 clicks = int(state.get("finished_clicks", 0)) + 1
                 state["finished_clicks"] = clicks
                 self._save_state_locked(state)
+                self._flush_state_locked()
 
+                # the group payload saves the UI a follow-up GET /api/group
                 if clicks < 2:
                     return jsonify(
-                        {"ok": True, "confirmed": False, "finished_clicks": clicks}
+                        {
+                            "ok": True,
+                            "confirmed": False,
+                            "finished_clicks": clicks,
+                            "group": self._group_payload_locked(),
+                        }
                     )
 
-                keep_names = set(state.get("keep", []))
-                self._result = ReviewResult(keep_names=keep_names, confirmed=True)
-                self._result_ready.set()
+                keep_names = set(state.get("keep", ()))
+                self._results.put(ReviewResult(keep_names=keep_names, confirmed=True))
                 return jsonify(
-                    {"ok": True, "confirmed": True, "finished_clicks": clicks}
+                    {
+                        "ok": True,
+                        "confirmed": True,
+                        "finished_clicks": clicks,
+                        "group": self._group_payload_locked(),
+                    }
                 )
 
         @app.post("/api/reset_finished")
@@ -408,12 +873,7 @@ class ReviewServer:
 
 
 def attach_flask_logger(app: Flask, ui) -> None:
-    # Route werkzeug logs to ui.log_flask
-    logger = logging.getLogger("werkzeug")
-    logger.setLevel(logging.INFO)
-    logger.handlers.clear()
-    logger.propagate = False
-
+    # Route werkzeug (and waitress, when it's serving) logs to ui.log_flask
     class UILogHandler(logging.Handler):
         def emit(self, record):
             try:
@@ -421,7 +881,12 @@ def attach_flask_logger(app: Flask, ui) -> None:
             except Exception:
                 pass
 
-    logger.addHandler(UILogHandler())
+    for name in ("werkzeug", "waitress"):
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+        logger.handlers.clear()
+        logger.propagate = False
+        logger.addHandler(UILogHandler())
 
     # ALSO: Werkzeug prints some startup warnings via its internal _log (not logging)
     # Patch it so it doesn't blast the terminal and mess with Rich's Live screen.